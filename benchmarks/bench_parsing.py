@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+import contextlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import optparse
+from tabulate import tabulate
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import java_code_analyser as analyser
+from make_corpus import corpus_names, corpus_file
+
+SHIM_DIR = os.path.join(BENCHMARK_DIR, 'shim')
+
+DETECTORS = [
+    (analyser.extract_null_pointer_error_details, analyser.generate_null_pointer_exception_code),
+    (analyser.extract_divide_by_zero_error_details, analyser.generate_divide_by_zero_exception_code),
+    (analyser.extract_array_index_out_of_bounds_details, analyser.generate_array_index_out_of_bounds_exception_code),
+    (analyser.extract_dynamic_cast_check, analyser.generate_dynamic_cast_exception_code),
+]
+
+
+def replay(jbmc_output, class_name):
+    # Every detector over the whole output, and the counterexample for each one that matches
+    random.seed(0)
+    generated = 0
+    for extract, generate in DETECTORS:
+        details = extract(jbmc_output)
+        if details['hasError']:
+            generated += len(generate(details, class_name))
+    return generated
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def measure_allocations(function):
+    # Most memory allocated at once during the call. A separate pass, tracemalloc slows the
+    # measured code down too much to time it at the same time.
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def end_to_end(name, work_directory):
+    # analyse_target with the shim standing in for jbmc: process start, reading the pipe,
+    # parsing and writing the counterexample
+    java_file_path = os.path.join(work_directory, name + '.java')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        analyser.analyse_target(java_file_path, False, False, timeout=600, use_prescreen=False, compile_source=False)
+
+
+def run_benchmarks(names, sizes, repeat=3, allocations=True, with_end_to_end=False):
+    results = []
+    work_directory = tempfile.mkdtemp(prefix='jbmc_bench_')
+    path = os.environ.get('PATH', '')
+    os.environ['PATH'] = SHIM_DIR + os.pathsep + path
+    try:
+        for size_mb in sizes:
+            os.environ['JBMC_SHIM_SIZE_MB'] = str(size_mb)
+            for name in names:
+                corpus_path = corpus_file(name, size_mb)
+                with open(corpus_path, 'r') as file:
+                    jbmc_output = file.read()
+                megabytes = len(jbmc_output.encode()) / (1024 * 1024)
+                seconds = best_time(lambda: replay(jbmc_output, name + "CounterExample"), repeat)
+                result = {
+                    'entry': name,
+                    'size_mb': size_mb,
+                    'megabytes': round(megabytes, 3),
+                    'seconds': round(seconds, 6),
+                    'mb_per_second': round(megabytes / seconds, 2) if seconds else None,
+                }
+                if allocations:
+                    peak = measure_allocations(lambda: replay(jbmc_output, name + "CounterExample"))
+                    result['peak_alloc_kb'] = round(peak / 1024, 1)
+                if with_end_to_end:
+                    e2e_seconds = best_time(lambda: end_to_end(name, work_directory), repeat)
+                    result['e2e_mb_per_second'] = round(megabytes / e2e_seconds, 2) if e2e_seconds else None
+                results.append(result)
+    finally:
+        os.environ['PATH'] = path
+        os.environ.pop('JBMC_SHIM_SIZE_MB', None)
+        shutil.rmtree(work_directory, ignore_errors=True)
+    return results
+
+
+def result_key(result):
+    return f"{result['entry']}@{result['size_mb']:g}MB"
+
+
+def find_regressions(results, baseline, tolerance):
+    # Entries whose throughput dropped by more than the tolerance against the saved baseline
+    previous = { result_key(result): result for result in baseline['results'] }
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if not before or not before.get('mb_per_second') or not result['mb_per_second']:
+            continue
+        if result['mb_per_second'] < before['mb_per_second'] * (1 - tolerance):
+            regressions.append((result_key(result), before['mb_per_second'], result['mb_per_second']))
+    return regressions
+
+
+def print_results(results):
+    table = []
+    for result in results:
+        table.append([
+            result['entry'],
+            f"{result['megabytes']:.2f}",
+            f"{result['seconds'] * 1000:.2f}",
+            result['mb_per_second'],
+            result.get('peak_alloc_kb', ''),
+            result.get('e2e_mb_per_second', ''),
+        ])
+    print(tabulate(table, headers=['Entry', 'Size (MB)', 'Parse (ms)', 'MB/s', 'Peak alloc (KB)', 'End-to-end MB/s']))
+
+
+if __name__ == "__main__":
+    parser = optparse.OptionParser(usage="%prog [options] [ENTRY...]")
+    parser.add_option("-s", "--sizes", dest="sizes", default="0,1,10", help="Comma separated trace sizes in MB, 0 for the recorded output")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=3, help="Runs per measurement, the fastest counts")
+    parser.add_option("--no-allocations", dest="allocations", action="store_false", default=True, help="Skip the tracemalloc pass")
+    parser.add_option("--end-to-end", dest="end_to_end", action="store_true", help="Also run analyse_target against the jbmc shim")
+    parser.add_option("--save", dest="save", help="Write the results to this JSON file")
+    parser.add_option("--baseline", dest="baseline", help="Compare against results saved with --save, exit 1 on a regression")
+    parser.add_option("--tolerance", dest="tolerance", type="float", default=0.25, help="Allowed throughput drop against the baseline")
+    (options, args) = parser.parse_args()
+
+    sizes = [float(size) for size in options.sizes.split(",") if size]
+    results = run_benchmarks(args or corpus_names(), sizes, options.repeat, options.allocations, options.end_to_end)
+    print_results(results)
+
+    if options.save:
+        with open(options.save, 'w') as file:
+            json.dump({ 'python': sys.version.split()[0], 'results': results }, file, indent=4)
+
+    if options.baseline:
+        with open(options.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, options.tolerance)
+        for key, before, after in regressions:
+            print(f"Regression: {key} {before} MB/s -> {after} MB/s")
+        if regressions:
+            sys.exit(1)
+        print(f"No throughput regressions beyond {options.tolerance:.0%}")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import os
+import re
+import subprocess
+import optparse
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, 'corpus')
+CACHE_DIR = os.path.join(BENCHMARK_DIR, '.corpus_cache')
+
+# Corpus entry -> program --record captures its JBMC output from. The checked-in outputs are
+# synthetic (written in JBMC's format, not produced by JBMC) until re-recorded. The yaml tasks
+# name directories of the SV-COMP Java suite, which is not part of this repository (see --tasks-root).
+SOURCES = {
+    'ArrayBounds': 'programs_error/ArrayBounds.java',
+    'DivideByZero': 'programs_error/DivideByZero.java',
+    'NullPointer': 'programs_error/NullPointer.java',
+    'CastExceptionExampleJava8': 'counterexample/CastExceptionExampleJava8.java',
+    'ClassCastExceptionExample': 'counterexample/ClassCastExceptionExample.java',
+    'InheritanceExceptionExample': 'counterexample/InheritanceExceptionExample.java',
+    'StringBuilderAppendException': 'counterexample/StringBuilderAppendException.java',
+    'StringComparisonException': 'counterexample/StringComparisonException.java',
+    'ArithmeticException1': 'yaml/ArithmeticException.yml',
+    'ArrayIndexOutOfBoundsException1': 'yaml/ArrayIndexOutOfBoundsException1.yml',
+    'NullPointerException': 'yaml/NullPointerException.yml',
+}
+
+STATE_PATTERN = re.compile(r'^State (\d+) ', re.MULTILINE)
+
+
+def corpus_names():
+    return sorted(name[:-len('.out')] for name in os.listdir(CORPUS_DIR) if name.endswith('.out'))
+
+
+def split_output(text):
+    # (prefix, repeatable block, suffix). Failing outputs grow by repeating their trace states,
+    # successful ones by repeating their property results, as bigger programs do.
+    if 'Violated property:' in text:
+        start = STATE_PATTERN.search(text).start()
+        end = text.index('Violated property:')
+    else:
+        start = text.index('** Results:\n') + len('** Results:\n')
+        end = text.index('\n** ', start) + 1
+    return text[:start], text[start:end], text[end:]
+
+
+def renumber_states(block, offset):
+    return STATE_PATTERN.sub(lambda match: f"State {int(match.group(1)) + offset} ", block)
+
+
+def write_scaled_output(text, target_bytes, output_path):
+    prefix, block, suffix = split_output(text)
+    states = [int(number) for number in STATE_PATTERN.findall(block)]
+    step = (max(states) - min(states) + 3) if states else 0
+    written = 0
+    copy = 0
+    # Write under a temporary name so an interrupted run never leaves a short file in the cache
+    temporary_path = output_path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        written += file.write(prefix)
+        while written + len(block) + len(suffix) < target_bytes:
+            written += file.write(renumber_states(block, copy * step) if step else block)
+            copy += 1
+        file.write(block if not step else renumber_states(block, copy * step))
+        file.write(suffix)
+    os.replace(temporary_path, output_path)
+
+
+def corpus_file(name, size_mb=0):
+    # Path of the recorded output, or of a copy grown to about size_mb megabytes (built once and cached)
+    base_path = os.path.join(CORPUS_DIR, name + '.out')
+    if not size_mb:
+        return base_path
+    scaled_path = os.path.join(CACHE_DIR, f"{name}.{size_mb:g}MB.out")
+    if not os.path.exists(scaled_path) or os.path.getmtime(scaled_path) < os.path.getmtime(base_path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(base_path, 'r') as file:
+            text = file.read()
+        write_scaled_output(text, int(size_mb * 1024 * 1024), scaled_path)
+    return scaled_path
+
+
+def source_for(name, tasks_root):
+    source = SOURCES[name]
+    if not source.endswith('.yml'):
+        return os.path.join(REPO_DIR, source)
+    if not tasks_root:
+        return None
+    # Tasks follow the SV-COMP layout: <task>/Main.java next to the yaml file
+    return os.path.join(tasks_root, name, 'Main.java')
+
+
+def record(name, tasks_root=None, timeout=600):
+    # Re-captures an entry from a real JBMC, with the options run_jbmc uses
+    source = source_for(name, tasks_root)
+    if source is None or not os.path.exists(source):
+        print(f"Skipping {name}: no source (pass --tasks-root for the yaml tasks)")
+        return False
+    subprocess.run(["javac", source], capture_output=True, text=True)
+    class_name = os.path.splitext(os.path.basename(source))[0]
+    result = subprocess.run(["jbmc", class_name, "--trace", "--unwind", "100"], capture_output=True, text=True,
+                            timeout=timeout, cwd=os.path.dirname(source))
+    with open(os.path.join(CORPUS_DIR, name + '.out'), 'w') as file:
+        file.write(result.stdout)
+    print(f"Recorded {name} ({len(result.stdout)} bytes)")
+    return True
+
+
+if __name__ == "__main__":
+    parser = optparse.OptionParser()
+    parser.add_option("--record", dest="record", action="store_true", help="Re-capture the corpus with the installed jbmc")
+    parser.add_option("--tasks-root", dest="tasks_root", help="Directory holding the yaml tasks' programs")
+    parser.add_option("-s", "--sizes", dest="sizes", default="1,10", help="Comma separated sizes in MB to build")
+    (options, args) = parser.parse_args()
+
+    names = args or corpus_names()
+    if options.record:
+        for name in names:
+            record(name, options.tasks_root)
+    for size_mb in [float(size) for size in options.sizes.split(",") if size]:
+        for name in names:
+            path = corpus_file(name, size_mb)
+            print(f"{path}: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+import struct
+import zipfile
+import optparse
+
+# Property classes the analyser has detectors for
+PROPERTIES = ['null-pointer', 'divide-by-zero', 'array-bounds', 'dynamic-cast', 'assertion']
+
+DIVISIONS = {0x6c, 0x6d, 0x70, 0x71}  # idiv, ldiv, irem, lrem
+ARRAY_ACCESSES = set(range(0x2e, 0x36)) | set(range(0x4f, 0x57))  # *aload, *astore
+# newarray, anewarray, multianewarray: JBMC checks the size is not negative
+ARRAY_ALLOCATIONS = {0xbc, 0xbd, 0xc5}
+CHECKCAST = 0xc0
+# getfield, putfield, invokevirtual, invokeinterface, arraylength, monitorenter, monitorexit
+DEREFERENCES = {0xb4, 0xb5, 0xb6, 0xb9, 0xbe, 0xc2, 0xc3}
+ATHROW = 0xbf
+INVOKES = {0xb6, 0xb7, 0xb8, 0xb9}  # invokevirtual, invokespecial, invokestatic, invokeinterface
+INVOKEDYNAMIC = 0xba
+STATIC_FIELD_ACCESSES = {0xb2, 0xb3}  # getstatic, putstatic
+
+OPERAND_LENGTHS = {}
+for opcode in [0x10, 0x12, 0xa9, 0xbc] + list(range(0x15, 0x1a)) + list(range(0x36, 0x3b)):
+    OPERAND_LENGTHS[opcode] = 1
+for opcode in [0x11, 0x13, 0x14, 0x84, 0xbb, 0xbd, 0xc0, 0xc1, 0xc6, 0xc7] + list(range(0x99, 0xa9)) + list(range(0xb2, 0xb9)):
+    OPERAND_LENGTHS[opcode] = 2
+OPERAND_LENGTHS[0xc5] = 3
+for opcode in [0xb9, 0xba, 0xc8, 0xc9]:
+    OPERAND_LENGTHS[opcode] = 4
+
+TABLESWITCH = 0xaa
+LOOKUPSWITCH = 0xab
+WIDE = 0xc4
+IINC = 0x84
+
+
+class ClassFormatError(Exception):
+    pass
+
+
+def read_constant_pool(data, offset):
+    count = struct.unpack_from(">H", data, offset)[0]
+    offset += 2
+    pool = [None] * count
+    index = 1
+    while index < count:
+        tag = data[offset]
+        offset += 1
+        if tag == 1:
+            length = struct.unpack_from(">H", data, offset)[0]
+            pool[index] = ('utf8', data[offset + 2:offset + 2 + length].decode('utf-8', errors='replace'))
+            offset += 2 + length
+        elif tag in (3, 4):
+            pool[index] = ('literal', data[offset:offset + 4])
+            offset += 4
+        elif tag in (5, 6):
+            pool[index] = ('literal', data[offset:offset + 8])
+            offset += 8
+            index += 1  # long and double take two slots
+        elif tag in (7, 8, 16, 19, 20):
+            pool[index] = (tag, struct.unpack_from(">H", data, offset)[0])
+            offset += 2
+        elif tag in (9, 10, 11, 12, 17, 18):
+            pool[index] = (tag,) + struct.unpack_from(">HH", data, offset)
+            offset += 4
+        elif tag == 15:
+            pool[index] = (tag, data[offset], struct.unpack_from(">H", data, offset + 1)[0])
+            offset += 3
+        else:
+            raise ClassFormatError(f"Unknown constant pool tag {tag}")
+        index += 1
+    return pool, offset
+
+
+def utf8(pool, index):
+    return pool[index][1]
+
+
+def class_name(pool, index):
+    return utf8(pool, pool[index][1])
+
+
+def member_ref(pool, index):
+    # (owner class, name, descriptor) of a Fieldref/Methodref/InterfaceMethodref
+    _, class_index, name_and_type_index = pool[index]
+    _, name_index, descriptor_index = pool[name_and_type_index]
+    return class_name(pool, class_index), utf8(pool, name_index), utf8(pool, descriptor_index)
+
+
+def read_attributes(data, offset):
+    count = struct.unpack_from(">H", data, offset)[0]
+    offset += 2
+    attributes = []
+    for _ in range(count):
+        name_index, length = struct.unpack_from(">HI", data, offset)
+        attributes.append((name_index, data[offset + 6:offset + 6 + length]))
+        offset += 6 + length
+    return attributes, offset
+
+
+def read_members(data, offset, pool):
+    count = struct.unpack_from(">H", data, offset)[0]
+    offset += 2
+    members = []
+    for _ in range(count):
+        access_flags, name_index, descriptor_index = struct.unpack_from(">HHH", data, offset)
+        attributes, offset = read_attributes(data, offset + 6)
+        code = None
+        for attribute_name, body in attributes:
+            if utf8(pool, attribute_name) == 'Code':
+                code_length = struct.unpack_from(">I", body, 4)[0]
+                code = body[8:8 + code_length]
+        members.append({
+            'access_flags': access_flags,
+            'name': utf8(pool, name_index),
+            'descriptor': utf8(pool, descriptor_index),
+            'code': code,
+        })
+    return members, offset
+
+
+def read_bootstrap_methods(body):
+    # (method handle index, [argument indices]) for each entry invokedynamic can refer to
+    count = struct.unpack_from(">H", body, 0)[0]
+    offset = 2
+    bootstrap_methods = []
+    for _ in range(count):
+        handle_index, argument_count = struct.unpack_from(">HH", body, offset)
+        arguments = list(struct.unpack_from(f">{argument_count}H", body, offset + 4))
+        bootstrap_methods.append((handle_index, arguments))
+        offset += 4 + 2 * argument_count
+    return bootstrap_methods
+
+
+def read_class(data):
+    if data[:4] != b'\xca\xfe\xba\xbe':
+        raise ClassFormatError("Not a class file")
+    try:
+        pool, offset = read_constant_pool(data, 8)
+        _, this_index, super_index, interface_count = struct.unpack_from(">HHHH", data, offset)
+        offset += 8 + 2 * interface_count
+        _, offset = read_members(data, offset, pool)  # fields
+        methods, offset = read_members(data, offset, pool)
+        attributes, offset = read_attributes(data, offset)
+        bootstrap_methods = []
+        for attribute_name, body in attributes:
+            if utf8(pool, attribute_name) == 'BootstrapMethods':
+                bootstrap_methods = read_bootstrap_methods(body)
+    except (struct.error, IndexError, TypeError) as e:
+        raise ClassFormatError(f"Truncated or malformed class file: {e}")
+    return {
+        'name': class_name(pool, this_index),
+        'super': class_name(pool, super_index) if super_index else None,
+        'constant_pool': pool,
+        'methods': methods,
+        'bootstrap_methods': bootstrap_methods,
+    }
+
+
+def iter_instructions(code):
+    # Yields (offset, opcode, operand bytes) for every instruction in a method body
+    offset = 0
+    while offset < len(code):
+        opcode = code[offset]
+        start = offset + 1
+        if opcode in (TABLESWITCH, LOOKUPSWITCH):
+            start += (4 - start % 4) % 4  # operands are 4-byte aligned
+            if opcode == TABLESWITCH:
+                low, high = struct.unpack_from(">ii", code, start + 4)
+                end = start + 12 + 4 * (high - low + 1)
+            else:
+                pairs = struct.unpack_from(">i", code, start + 4)[0]
+                end = start + 8 + 8 * pairs
+        elif opcode == WIDE:
+            end = start + (5 if code[start] == IINC else 3)
+        else:
+            end = start + OPERAND_LENGTHS.get(opcode, 0)
+        yield offset, opcode, code[start:end]
+        offset = end
+
+
+def is_library_class(name):
+    return name.startswith('java/') or name.startswith('javax/')
+
+
+def scan_class(parsed):
+    try:
+        return scan_methods(parsed)
+    except (struct.error, IndexError, TypeError, ValueError) as e:
+        raise ClassFormatError(f"Malformed method body: {e}")
+
+
+def scan_methods(parsed):
+    pool = parsed['constant_pool']
+    found = set()
+    for method in parsed['methods']:
+        if method['code'] is None:
+            continue
+        for _, opcode, operands in iter_instructions(method['code']):
+            if opcode in DIVISIONS:
+                found.add('divide-by-zero')
+            elif opcode in ARRAY_ACCESSES:
+                found.update(('array-bounds', 'null-pointer'))
+            elif opcode in ARRAY_ALLOCATIONS:
+                found.add('array-bounds')
+            elif opcode == CHECKCAST:
+                found.add('dynamic-cast')
+            elif opcode == ATHROW:
+                found.update(('assertion', 'null-pointer'))
+            elif opcode == INVOKEDYNAMIC:
+                return set(PROPERTIES)
+
+            if opcode in DEREFERENCES:
+                found.add('null-pointer')
+            if opcode in INVOKES or opcode in STATIC_FIELD_ACCESSES:
+                owner, name, _ = member_ref(pool, struct.unpack(">H", operands[:2])[0])
+                # Code in other classes is not scanned here, so calling into it, or touching a static
+                # field that runs its static initialiser, means checking everything.
+                # Library calls other than Object's constructor can throw as well.
+                if owner != parsed['name'] and not (owner == 'java/lang/Object' and name == '<init>'):
+                    return set(PROPERTIES)
+    return found
+
+
+def prescreen_class(class_file_path):
+    # Sorted property classes that need JBMC, [] for nothing checkable, None when the class cannot be read
+    try:
+        with open(class_file_path, 'rb') as file:
+            return sorted(scan_class(read_class(file.read())))
+    except (OSError, ClassFormatError):
+        return None
+
+
+def prescreen_jar(jar_file_path):
+    try:
+        found = set()
+        with zipfile.ZipFile(jar_file_path) as jar:
+            for entry in jar.namelist():
+                if entry.endswith('.class'):
+                    found |= scan_class(read_class(jar.read(entry)))
+        return sorted(found)
+    except (OSError, zipfile.BadZipFile, ClassFormatError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = optparse.OptionParser(usage="%prog [options] FILE.class|FILE.jar ...")
+    (options, args) = parser.parse_args()
+    for path in args:
+        properties = prescreen_jar(path) if path.endswith('.jar') else prescreen_class(path)
+        if properties is None:
+            print(f"{path}: could not be read")
+        elif not properties:
+            print(f"{path}: nothing to check")
+        else:
+            print(f"{path}: {', '.join(properties)}")
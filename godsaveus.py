@@ -1,10 +1,117 @@
 import os
+import ast
 import subprocess
 import json
 import time
+import optparse
 from tabulate import tabulate
+from results_store import connect_results_db, start_run, ResultsWriter
+from scheduler import historical_runtimes, historical_peak_rss, plan_jobs, predict_memory, run_jobs, available_memory_kb, timeout_bounds
+from progress_monitor import ProgressMonitor, start_metrics_server
+from java_code_analyser import PORTFOLIO
 
-def run_command_on_jars(directory, output_directory):
+STARTUP_MARGIN = 0.5
+# Share of the memory free at start that parallel jobs may reserve between them
+MEMORY_HEADROOM = 0.9
+
+
+def parse_args():
+    parser = optparse.OptionParser()
+    parser.add_option("-d", "--directory", dest="directory", default="jbmc-regression/", help="Directory containing the benchmark jars")
+    parser.add_option("-o", "--output", dest="output_directory", default="path_to_output_directory", help="Directory for results.json")
+    parser.add_option("--db", dest="db", help="SQLite database to record this run in")
+    parser.add_option("-w", "--workers", dest="workers", type="int", default=1, help="Number of jars to verify in parallel")
+    parser.add_option("-t", "--timeout", dest="timeout", type="float", default=1.0, help="Timeout in seconds for tasks without history")
+    parser.add_option("--min-timeout", dest="min_timeout", type="float", help="Lowest timeout given to a task with history (default: a quarter of --timeout)")
+    parser.add_option("--max-timeout", dest="max_timeout", type="float", help="Highest timeout given to a task with history (default: ten times --timeout, at most --budget)")
+    parser.add_option("--memory-limit", dest="memory_limit", type="float", help="Memory in MB parallel jobs may use together (default: 90% of free memory)")
+    parser.add_option("--default-rss", dest="default_rss", type="float", default=1024, help="Predicted peak memory in MB of a task without history")
+    parser.add_option("--portfolio", dest="portfolio", action="store_true", help="Race several JBMC configurations per task")
+    parser.add_option("--metrics-port", dest="metrics_port", type="int", help="Serve live Prometheus metrics on this local port")
+    parser.add_option("--html", dest="html", help="HTML results table rewritten as each task finishes")
+    parser.add_option("--budget", dest="budget", type="float", help="Wall-clock budget in seconds for the whole run")
+    parser.add_option("--top", dest="top", type="int", help="List the N tasks with the highest peak memory")
+    (options, args) = parser.parse_args()
+    return options
+
+
+def parse_benchmark_object(output):
+    # The analyser prints its benchmark object as the last dict on stdout
+    for line in reversed(output.splitlines()):
+        if line.startswith('{'):
+            try:
+                return ast.literal_eval(line)
+            except (ValueError, SyntaxError):
+                return {}
+    return {}
+
+
+def run_task(job, timeout, writer=None, portfolio=False, monitor=None):
+    jar_file = job['task']
+    if monitor:
+        monitor.job_started(jar_file)
+    expected_result = 'True' if 'true' in jar_file else 'False'
+    command = ['python3', 'jbmcsaveus.py', '-b', 'True', '-t', f"{timeout:.2f}", '-f', jar_file]
+    if portfolio:
+        command.append('--portfolio')
+    benchmark_object = {}
+    print(f"Running command on {jar_file} (timeout {timeout:.2f}s): {' '.join(command)}")
+    start_time = time.time()
+
+    try:
+        # Leave the analyser a moment to start up before JBMC's own timeout applies
+        result = subprocess.run(command, timeout=timeout + STARTUP_MARGIN, capture_output=True, text=True)
+        output = result.stdout
+        elapsed_time = time.time() - start_time
+        if result.stderr:
+            print("Error:", result.stderr)
+
+        counter_example_generated = "Yes" if "file_name" in output else "No"
+        benchmark_object = parse_benchmark_object(output)
+        if benchmark_object.get('noVerdict'):
+            # JBMC's own timeout fired inside the analyser, or it gave no conclusive answer
+            actual_result = benchmark_object['noVerdict']
+        elif benchmark_object.get('hasError') is None:
+            actual_result = 'Unknown'
+        else:
+            actual_result = 'False' if 'True' in output else 'True'
+
+    except subprocess.TimeoutExpired:
+        print(f"Command on {jar_file} timed out.")
+        elapsed_time = timeout
+        actual_result = 'Timeout'
+        counter_example_generated = 'No'
+
+    row = {
+        'File Name': jar_file,
+        'Expected Result': expected_result,
+        'Actual Result': actual_result,
+        'Counter Example Generated?': counter_example_generated,
+        'Time to Execute (s)': f"{elapsed_time:.2f}"
+    }
+    if benchmark_object.get('configuration'):
+        row['Configuration'] = benchmark_object['configuration']
+
+    phases = {'jbmc': elapsed_time}
+    profile = benchmark_object.get('profile')
+    if profile:
+        row['Peak RSS (MB)'] = f"{profile.get('max_rss_kb', 0) / 1024:.1f}"
+        row['CPU (s)'] = f"{profile.get('user_cpu_seconds', 0) + profile.get('sys_cpu_seconds', 0):.2f}"
+        row['Solver (s)'] = f"{profile.get('solver_seconds', 0):.2f}"
+        for phase in ('symex', 'convert_ssa', 'solver'):
+            if f"{phase}_seconds" in profile:
+                phases[phase] = profile[f"{phase}_seconds"]
+
+    if writer:
+        writer.add(row, phases, profile)
+    if monitor:
+        monitor.job_finished(row, phases)
+    return row
+
+
+def run_command_on_jars(directory, output_directory, db_path=None, workers=1, timeout=1.0,
+                        min_timeout=None, max_timeout=None, budget=None, portfolio=False,
+                        metrics_port=None, html_path=None, top=None, memory_limit=None, default_rss=1024):
     original_directory = os.getcwd()  # Save the original directory
     os.chdir(directory)  # Change to the target directory
 
@@ -16,70 +123,122 @@ def run_command_on_jars(directory, output_directory):
     else:
         print(f"Directory {full_output_path} already exists")
 
-    results = []
     summary = {
         'Total Expected True': 0,
         'Total Actual True': 0,
         'Total Expected False': 0,
         'Total Actual False': 0,
         'Counter Examples Generated': 0,
-        'Total Timeouts': 0
+        'Total Timeouts': 0,
+        'Total Unknown': 0,
+        'Total Skipped': 0
     }
 
+    monitor = None
+    if metrics_port or html_path:
+        monitor = ProgressMonitor(os.path.join(original_directory, html_path) if html_path else None)
+    if metrics_port:
+        start_metrics_server(monitor, metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{metrics_port}/metrics")
+
+    writer = None
+    history = {}
+    rss_history = {}
+    if db_path:
+        db_path = os.path.join(original_directory, db_path)
+        conn = connect_results_db(db_path)
+        history = historical_runtimes(conn)
+        rss_history = historical_peak_rss(conn)
+
     try:
         files = os.listdir()
         jar_files = [file for file in files if file.endswith('.jar')]
 
-        for jar_file in jar_files:
-            expected_result = 'True' if 'true' in jar_file else 'False'
-            summary['Total Expected True' if expected_result == 'True' else 'Total Expected False'] += 1
-            command = ['python3', 'jbmcsaveus.py', '-b', 'True', '-f', jar_file]
-            print(f"Running command on {jar_file}: {' '.join(command)}")
-            start_time = time.time()
+        jobs = plan_jobs(jar_files, history, timeout, min_timeout, max_timeout, budget)
 
-            try:
-                result = subprocess.run(command, timeout=1, capture_output=True, text=True)
-                output = result.stdout
-                elapsed_time = time.time() - start_time
-                if result.stderr:
-                    print("Error:", result.stderr)
-
-                actual_result = 'False' if 'True' in output else 'True' 
-                summary['Total Actual True' if actual_result == 'False' else 'Total Actual False'] += 1
-                counter_example_generated = "Yes" if "file_name" in output else "No"
-                if counter_example_generated == "Yes":
-                    summary['Counter Examples Generated'] += 1
-
-                results.append({
-                    'File Name': jar_file,
-                    'Expected Result': expected_result,
-                    'Actual Result': actual_result,
-                    'Counter Example Generated?': counter_example_generated,
-                    'Time to Execute (s)': f"{elapsed_time:.2f}"
-                })
-
-            except subprocess.TimeoutExpired:
-                print(f"Command on {jar_file} timed out.")
-                summary['Total Timeouts'] += 1
-                results.append({
-                    'File Name': jar_file,
-                    'Expected Result': expected_result,
-                    'Actual Result': 'Timeout',
-                    'Counter Example Generated?': 'No',
-                    'Time to Execute (s)': '1.00'
-                })
+        memory_limit_kb = None
+        if workers > 1:
+            program_sizes = {jar_file: os.path.getsize(jar_file) for jar_file in jar_files}
+            # Every configuration of a portfolio runs as its own JBMC process at the same time
+            predict_memory(jobs, rss_history, program_sizes, int(default_rss * 1024),
+                           processes=len(PORTFOLIO) if portfolio else 1)
+            free_kb = available_memory_kb()
+            memory_limit_kb = int(memory_limit * 1024) if memory_limit else (int(free_kb * MEMORY_HEADROOM) if free_kb else None)
+            if memory_limit_kb:
+                print(f"Admitting jobs within {memory_limit_kb / 1024:.0f} MB of predicted peak memory")
+
+        if db_path:
+            # Everything that changes verdicts or runtimes, so a regression can be told apart from a new configuration
+            effective_min_timeout, effective_max_timeout = timeout_bounds(timeout, min_timeout, max_timeout, budget)
+            run_options = {
+                'analyser': ['-b', 'True'] + (['--portfolio'] if portfolio else []),
+                'portfolio': [name for name, _, _ in PORTFOLIO] if portfolio else None,
+                'workers': workers,
+                'timeout': timeout,
+                'min_timeout': effective_min_timeout,
+                'max_timeout': effective_max_timeout,
+                'budget': budget,
+                'memory_limit_mb': round(memory_limit_kb / 1024) if memory_limit_kb else None,
+                'default_rss_mb': default_rss,
+            }
+            run_id = start_run(conn, 'CAV2018', json.dumps(run_options, sort_keys=True))
+            writer = ResultsWriter(conn, run_id)
+            print(f"Recording run {run_id} in {db_path}")
+
+        if monitor:
+            for job in jobs:
+                monitor.job_queued(job['task'])
+        results, skipped = run_jobs(jobs, lambda job, job_timeout: run_task(job, job_timeout, writer, portfolio, monitor),
+                                    workers, budget, memory_limit_kb)
+
+        for job in skipped:
+            print(f"Skipped {job['task']}, the time budget is used up.")
+            row = {
+                'File Name': job['task'],
+                'Expected Result': 'True' if 'true' in job['task'] else 'False',
+                'Actual Result': 'Skipped',
+                'Counter Example Generated?': 'No',
+                'Time to Execute (s)': '0.00'
+            }
+            results.append(row)
+            if monitor:
+                monitor.job_finished(row, started=False)
 
     finally:
         os.chdir(original_directory)  # Restore original directory
+        if writer:
+            writer.flush()
+        if monitor:
+            monitor.run_finished()
+
+    results.sort(key=lambda row: row['File Name'])
+    for row in results:
+        summary['Total Expected True' if row['Expected Result'] == 'True' else 'Total Expected False'] += 1
+        if row['Actual Result'] == 'Timeout':
+            summary['Total Timeouts'] += 1
+        elif row['Actual Result'] == 'Skipped':
+            summary['Total Skipped'] += 1
+        elif row['Actual Result'] == 'Unknown':
+            summary['Total Unknown'] += 1
+        else:
+            summary['Total Actual True' if row['Actual Result'] == 'False' else 'Total Actual False'] += 1
+        if row['Counter Example Generated?'] == 'Yes':
+            summary['Counter Examples Generated'] += 1
 
     # Print results table
     print(tabulate(results, headers="keys", tablefmt="grid"))
 
+    if top:
+        profiled = [row for row in results if 'Peak RSS (MB)' in row]
+        profiled.sort(key=lambda row: float(row['Peak RSS (MB)']), reverse=True)
+        print(f"\nTop {top} tasks by peak memory:")
+        print(tabulate(profiled[:top], headers="keys", tablefmt="grid"))
+
     # Calculate the new accuracy based on the given formula
     total_cases = len(jar_files)
     difference_true = abs(summary['Total Expected True'] - summary['Total Actual True'])
     difference_false = abs(summary['Total Expected False'] - summary['Total Actual False'])
-    tt = summary['Total Timeouts']
+    tt = summary['Total Timeouts'] + summary['Total Skipped'] + summary['Total Unknown']
     accuracy = (((difference_true + difference_false) - tt) / total_cases)*100
     accuracy = 100 - accuracy
 
@@ -94,14 +253,20 @@ def run_command_on_jars(directory, output_directory):
     print(f"Accuracy of proposed model: {accuracy:.2f}")
     print(f"Counter Examples Generated: {summary['Counter Examples Generated']}")
     print(f"Total Timeouts: {summary['Total Timeouts']}")
+    print(f"Total Unknown: {summary['Total Unknown']}")
+    print(f"Total Skipped: {summary['Total Skipped']}")
 
     # Save results to JSON file
     results_file_path = os.path.join(full_output_path, 'results.json')
     with open(results_file_path, 'w') as file:
-        json.dump(results, file, indent=4) # Save summary to the same file
-        json.dump(summary, file, indent=4)
+        json.dump({'results': results, 'summary': summary}, file, indent=4)
     print(f"Results saved to {results_file_path}")
-    
 
-# Example usage
-run_command_on_jars('jbmc-regression/', 'path_to_output_directory')
+
+if __name__ == "__main__":
+    options = parse_args()
+    run_command_on_jars(options.directory, options.output_directory, options.db, options.workers,
+                        options.timeout, options.min_timeout, options.max_timeout, options.budget,
+                        options.portfolio, options.metrics_port, options.html, options.top,
+                        options.memory_limit, options.default_rss)
+
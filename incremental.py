@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import os
+import struct
+import zipfile
+import optparse
+from class_prescreen import read_class, iter_instructions, member_ref, class_name, ClassFormatError
+
+MAIN_DESCRIPTOR = '([Ljava/lang/String;)V'
+ACC_STATIC = 0x0008
+
+# Opcodes whose first operand is a constant pool index, and its width
+CONSTANT_OPERANDS = {0x12: 1}
+for opcode in [0x13, 0x14, 0xbb, 0xbd, 0xc0, 0xc1, 0xc5] + list(range(0xb2, 0xbb)):
+    CONSTANT_OPERANDS[opcode] = 2
+INVOKES = {0xb6, 0xb7, 0xb8, 0xb9}
+VIRTUAL_INVOKES = {0xb6, 0xb9}
+INVOKEDYNAMIC = 0xba
+# getstatic, putstatic and new run the static initialiser of the class they name
+STATIC_FIELD_ACCESSES = {0xb2, 0xb3}
+NEW = 0xbb
+METHOD_HANDLE = 15
+
+
+def describe_constant(pool, index):
+    entry = pool[index]
+    if entry[0] in ('utf8', 'literal'):
+        return repr(entry[1])
+    tag = entry[0]
+    if tag in (7, 8, 16, 19, 20):
+        return f"{tag}:{describe_constant(pool, entry[1])}"
+    if tag in (9, 10, 11):
+        return f"{tag}:" + ".".join(member_ref(pool, index))
+    if tag == 12:
+        return f"{tag}:{describe_constant(pool, entry[1])}:{describe_constant(pool, entry[2])}"
+    # MethodHandle kind, and the bootstrap method index of Dynamic and InvokeDynamic, stay as they are
+    return f"{tag}:{entry[1]}:{describe_constant(pool, entry[2])}"
+
+
+def describe_bootstrap_method(pool, bootstrap_methods, index):
+    # The bootstrap method an InvokeDynamic constant names, with its static arguments
+    handle_index, arguments = bootstrap_methods[pool[index][1]]
+    return ",".join(describe_constant(pool, argument) for argument in [handle_index] + arguments)
+
+
+def handle_targets(pool, bootstrap_methods, index):
+    # Methods behind the method handles of an invokedynamic's bootstrap method and arguments,
+    # such as the lambda body a LambdaMetafactory call site links to
+    handle_index, arguments = bootstrap_methods[pool[index][1]]
+    for argument in [handle_index] + arguments:
+        entry = pool[argument]
+        if entry[0] == METHOD_HANDLE and pool[entry[2]][0] in (10, 11):
+            yield member_ref(pool, entry[2])
+
+
+def method_key(owner, name, descriptor):
+    return f"{owner}.{name}:{descriptor}"
+
+
+def read_class_methods(parsed, methods):
+    pool = parsed['constant_pool']
+    bootstrap_methods = parsed['bootstrap_methods']
+    for method in parsed['methods']:
+        digest = hashlib.sha256(f"{method['access_flags']}:{parsed['super']}".encode())
+        calls = []
+        initialises = []
+        for _, opcode, operands in iter_instructions(method['code'] or b''):
+            digest.update(bytes([opcode]))
+            width = CONSTANT_OPERANDS.get(opcode)
+            if width:
+                index = operands[0] if width == 1 else struct.unpack(">H", operands[:2])[0]
+                digest.update(describe_constant(pool, index).encode())
+                digest.update(operands[width:])
+            else:
+                digest.update(operands)
+            if opcode in INVOKES:
+                owner, name, descriptor = member_ref(pool, struct.unpack(">H", operands[:2])[0])
+                calls.append((opcode in VIRTUAL_INVOKES, owner, name, descriptor))
+            elif opcode == INVOKEDYNAMIC:
+                index = struct.unpack(">H", operands[:2])[0]
+                digest.update(describe_bootstrap_method(pool, bootstrap_methods, index).encode())
+                for owner, name, descriptor in handle_targets(pool, bootstrap_methods, index):
+                    calls.append((False, owner, name, descriptor))
+            elif opcode in STATIC_FIELD_ACCESSES:
+                initialises.append(member_ref(pool, struct.unpack(">H", operands[:2])[0])[0])
+            elif opcode == NEW:
+                initialises.append(class_name(pool, struct.unpack(">H", operands[:2])[0]))
+        methods[method_key(parsed['name'], method['name'], method['descriptor'])] = {
+            'class': parsed['name'],
+            'name': method['name'],
+            'descriptor': method['descriptor'],
+            'static': bool(method['access_flags'] & ACC_STATIC),
+            'hash': digest.hexdigest(),
+            'calls': calls,
+            'initialises': initialises,
+        }
+
+
+def read_jar_methods(jar_file_path):
+    # Per method: a hash of its bytecode with constant pool indices resolved to the
+    # symbols they name (so unrelated edits that renumber the pool do not count),
+    # and the methods it may call
+    methods = {}
+    with zipfile.ZipFile(jar_file_path) as jar:
+        for entry in jar.namelist():
+            if not entry.endswith('.class'):
+                continue
+            parsed = read_class(jar.read(entry))
+            try:
+                read_class_methods(parsed, methods)
+            except (struct.error, IndexError, TypeError, ValueError) as e:
+                raise ClassFormatError(f"Malformed method body in {entry}: {e}")
+    return methods
+
+
+def callees(methods, method, by_signature):
+    for virtual, owner, name, descriptor in method['calls']:
+        key = method_key(owner, name, descriptor)
+        if key in methods:
+            yield key
+        if virtual:
+            # Any override in the jar may be the one dispatched to
+            for override in by_signature.get((name, descriptor), []):
+                yield override
+        # A class's static initialiser runs before its first use
+        clinit = method_key(owner, '<clinit>', '()V')
+        if clinit in methods:
+            yield clinit
+    for owner in method['initialises']:
+        clinit = method_key(owner, '<clinit>', '()V')
+        if clinit in methods:
+            yield clinit
+
+
+def entry_point_fingerprints(jar_file_path):
+    # Fingerprint of every main method over its own bytecode and that of everything it can reach
+    methods = read_jar_methods(jar_file_path)
+    by_signature = {}
+    for key, method in methods.items():
+        by_signature.setdefault((method['name'], method['descriptor']), []).append(key)
+
+    fingerprints = {}
+    for key, method in methods.items():
+        if method['name'] != 'main' or method['descriptor'] != MAIN_DESCRIPTOR or not method['static']:
+            continue
+        reachable = {key}
+        clinit = method_key(method['class'], '<clinit>', '()V')
+        if clinit in methods:
+            reachable.add(clinit)
+        pending = list(reachable)
+        while pending:
+            for callee in callees(methods, methods[pending.pop()], by_signature):
+                if callee not in reachable:
+                    reachable.add(callee)
+                    pending.append(callee)
+        digest = hashlib.sha256()
+        for reached in sorted(reachable):
+            digest.update(f"{reached}={methods[reached]['hash']}\n".encode())
+        fingerprints[method['class'].replace('/', '.')] = digest.hexdigest()
+    return fingerprints
+
+
+def load_state(state_file_path):
+    if not os.path.exists(state_file_path):
+        return {}
+    with open(state_file_path, 'r') as file:
+        return json.load(file)
+
+
+def save_state(state_file_path, state):
+    # Write to a temporary file first so an interrupted run cannot corrupt the state
+    temporary_path = state_file_path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(state, file, indent=4)
+    os.replace(temporary_path, state_file_path)
+
+
+def plan_verification(jar_file_path, state, settings=None):
+    # Returns (fingerprints, entry points to verify, verdicts that can be reused).
+    # A verdict is only reused when it was reached with the same settings (JBMC version and
+    # options); settings=None compares the bytecode alone.
+    fingerprints = entry_point_fingerprints(jar_file_path)
+    previous = state.get(os.path.abspath(jar_file_path), {})
+    changed = []
+    reused = {}
+    for entry_point, fingerprint in sorted(fingerprints.items()):
+        recorded = previous.get(entry_point)
+        if recorded and recorded['fingerprint'] == fingerprint and (settings is None or recorded.get('settings') == settings):
+            reused[entry_point] = recorded['verdict']
+        else:
+            changed.append(entry_point)
+    return fingerprints, changed, reused
+
+
+def record_verdicts(state, jar_file_path, fingerprints, verdicts, settings=None):
+    state[os.path.abspath(jar_file_path)] = {
+        entry_point: { 'fingerprint': fingerprints[entry_point], 'settings': settings, 'verdict': verdict }
+        for entry_point, verdict in verdicts.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = optparse.OptionParser(usage="%prog [options] FILE.jar")
+    parser.add_option("-s", "--state", dest="state", default=".jbmc_incremental.json", help="Incremental state file")
+    (options, args) = parser.parse_args()
+    state = load_state(options.state)
+    for jar_file_path in args:
+        try:
+            _, changed, reused = plan_verification(jar_file_path, state)
+        except (OSError, zipfile.BadZipFile, ClassFormatError) as e:
+            print(f"{jar_file_path}: could not be read ({e})")
+            continue
+        print(f"{jar_file_path}: {len(changed)} entry points to verify, {len(reused)} with unchanged bytecode")
+        for entry_point in changed:
+            print(f"  changed: {entry_point}")
@@ -5,17 +5,59 @@ import re
 import optparse
 import random
 import os
+import queue
+import threading
+import time
+import zipfile
+import fnmatch
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from class_prescreen import prescreen_class, prescreen_jar, ClassFormatError
+from job_profile import run_profiled, start_profiled, wait_profiled, kill_profiled
+from incremental import load_state, save_state, plan_verification, record_verdicts
+from results_store import get_jbmc_version
+
+# Stands in for JBMC's output when the pre-screen finds nothing it could check
+PRESCREEN_OUTPUT = "VERIFICATION SUCCESSFUL (pre-screen: no checkable operations)\n"
+
+# Suffix of the class name of every counterexample the analyser writes
+COUNTEREXAMPLE_SUFFIX = "CounterExample"
+
+# Each configuration is (name, extra JBMC options, whether VERIFICATION SUCCESSFUL is conclusive).
+# Shallow unwinds can only be trusted when they find a failure.
+PORTFOLIO = [
+    ("sat-unwind100", ["--unwind", "100"], True),
+    ("sat-refine-arrays", ["--unwind", "100", "--refine-arrays"], True),
+    ("smt2-z3", ["--unwind", "100", "--smt2", "--z3"], True),
+    ("sat-unwind10", ["--unwind", "10"], False),
+]
 
 
 def parse_args():
     parser = optparse.OptionParser()
     parser.add_option("-f", "--file", dest="file", help="Path to the Java file to analyze")
+    parser.add_option("-d", "--dir", dest="directory", help="Directory to scan recursively instead of a single file")
+    parser.add_option("-g", "--glob", dest="glob", default="*.java", help="Comma separated file name patterns for --dir (default: *.java)")
+    parser.add_option("-w", "--workers", dest="workers", type="int", default=os.cpu_count() or 1, help="Files verified in parallel with --dir")
+    parser.add_option("--batch-size", dest="batch_size", type="int", default=20, help="Java files compiled per javac call with --dir")
+    parser.add_option("--report", dest="report", help="Write the consolidated --dir report to this JSON file")
     parser.add_option("-p", "--print-statements", dest="print_output", help="To print the steps")
     parser.add_option("-b", "--benchmark", dest="benchmark", help="To run the benchmark")
+    parser.add_option("-t", "--timeout", dest="timeout", type="float", default=5.0, help="Timeout in seconds for the JBMC run")
+    parser.add_option("--no-prescreen", dest="prescreen", action="store_false", default=True, help="Always run JBMC, even when the bytecode has nothing to check")
+    parser.add_option("--incremental", dest="incremental_state", help="State file for re-verifying only the changed entry points of a jar")
+    parser.add_option("--portfolio", dest="portfolio", action="store_true", help="Race several JBMC configurations and take the first verdict")
+    parser.add_option("--portfolio-configs", dest="portfolio_configs", help="Comma separated configuration names to race (default: all)")
     (options, args) = parser.parse_args()
 
     if options.benchmark or not options.print_output:
         options.print_output = None
+    if options.portfolio_configs:
+        try:
+            select_portfolio(options.portfolio_configs)
+        except ValueError as e:
+            parser.error(str(e))
 
     return options
     
@@ -30,28 +72,116 @@ def convert_java_to_class(java_file_path, should_print):
     subprocess.run(["javac", java_file_path], capture_output=True, text=True)
 
 
-def run_jbmc(java_file_path, should_print):
-    convert_java_to_class(java_file_path, should_print)
+def run_jbmc(java_file_path, should_print, timeout=5, compile_source=True, profile=None):
+    if compile_source:
+        convert_java_to_class(java_file_path, should_print)
     try:
         class_file_path = java_file_path.replace(".java", "")
         print_statements(should_print, f"Running JBMC on {class_file_path}...")
-        result = subprocess.run(["jbmc", class_file_path, "--trace", "--unwind", "100"], capture_output=True, text=True, timeout=5)
-        return result.stdout
+        stdout, job_profile = run_profiled(["jbmc", class_file_path, "--trace", "--unwind", "100"], timeout)
+        if profile is not None:
+            profile.update(job_profile)
+        return stdout
+    except subprocess.TimeoutExpired as e:
+        print(f"JBMC timed out after {timeout}s")
+        if profile is not None:
+            profile.update(getattr(e, 'profile', { 'timed_out': True }))
+        return None
     except Exception as e:
         print(f"Error running JBMC: {e}")
         return None
     
 
-def run_jbmc_on_jar(jar_file_path, should_print):
+def run_jbmc_on_jar(jar_file_path, should_print, timeout=5, main_class="Main", profile=None):
     try:
         print_statements(should_print, f"Running JBMC on {jar_file_path}...")
-        result = subprocess.run(["jbmc", "-jar", jar_file_path, "--main-class", "Main", "--unwind", "100", "--trace"], capture_output=True, text=True, timeout=5)
-        return result.stdout
+        stdout, job_profile = run_profiled(["jbmc", "-jar", jar_file_path, "--main-class", main_class, "--unwind", "100", "--trace"], timeout)
+        if profile is not None:
+            profile.update(job_profile)
+        return stdout
+    except subprocess.TimeoutExpired as e:
+        print(f"JBMC timed out after {timeout}s")
+        if profile is not None:
+            profile.update(getattr(e, 'profile', { 'timed_out': True }))
+        return None
     except Exception as e:
         print(f"Error running JBMC: {e}")
         return None
 
 
+def prescreen(target_path, benchmarking, should_print):
+    print_statements(should_print, f"Pre-screening bytecode of {target_path}...")
+    if benchmarking:
+        properties = prescreen_jar(target_path)
+    else:
+        properties = prescreen_class(target_path.replace(".java", "") + ".class")
+    if properties is None:
+        print_statements(should_print, "Could not read the bytecode, checking everything")
+    else:
+        print_statements(should_print, f"Properties to check: {', '.join(properties) or 'none'}")
+    return properties
+
+
+def should_check(property_name, properties):
+    return properties is None or property_name in properties
+
+
+def select_portfolio(names=None):
+    if not names:
+        return PORTFOLIO
+    wanted = [name.strip() for name in names.split(",")] if isinstance(names, str) else list(names)
+    known = [configuration[0] for configuration in PORTFOLIO]
+    unknown = [name for name in wanted if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown portfolio configuration {', '.join(unknown)} (known: {', '.join(known)})")
+    return [configuration for configuration in PORTFOLIO if configuration[0] in wanted]
+
+
+def run_jbmc_portfolio(target_args, should_print, timeout=5, configurations=PORTFOLIO):
+    finished = queue.Queue()
+    processes = {}
+
+    def read_output(name, process):
+        stdout, profile = wait_profiled(process)
+        finished.put((name, stdout, profile))
+
+    conclusive_success = {name: trusted for name, _, trusted in configurations}
+    deadline = time.time() + timeout
+    timed_out = False
+    try:
+        for name, extra_args, _ in configurations:
+            print_statements(should_print, f"Starting JBMC configuration {name}...")
+            process = start_profiled(["jbmc"] + target_args + extra_args + ["--trace"])
+            processes[name] = process
+            threading.Thread(target=read_output, args=(name, process), daemon=True).start()
+
+        for _ in range(len(processes)):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                timed_out = True
+                break
+            try:
+                name, stdout, profile = finished.get(timeout=remaining)
+            except queue.Empty:
+                timed_out = True
+                break
+            if "VERIFICATION FAILED" in stdout or ("VERIFICATION SUCCESSFUL" in stdout and conclusive_success[name]):
+                print_statements(should_print, f"Configuration {name} finished first")
+                return stdout, name, profile
+        # A success from a configuration that is not trusted with it would be reported as
+        # verified, so without a conclusive verdict the task gets none at all
+        print("Error running JBMC: no configuration reached a conclusive verdict")
+        return None, None, ({ 'timed_out': True } if timed_out else None)
+    except Exception as e:
+        print(f"Error running JBMC: {e}")
+        return None, None, None
+    finally:
+        # The losing configurations are no longer needed
+        for process in processes.values():
+            if process.returncode is None:
+                kill_profiled(process)
+
+
 def extract_null_pointer_error_details(jbmc_output):
     pattern = r'(?: Null pointer check: FAILURE)(\w*)'
     matches = re.search(pattern, jbmc_output)
@@ -168,28 +298,22 @@ def write_code_to_file(code, file_name):
         file.write(code)
 
 
-def main(java_file_path, benchmarking, should_print):
-    jbmc_output = None
-    fileName = "UnknownException"
-
-    if(benchmarking):
-        jbmc_output = run_jbmc_on_jar(java_file_path, should_print)
-        fileName = java_file_path.replace(".jar", "") + "CounterExample"
-    else:
-        jbmc_output = run_jbmc(java_file_path, should_print)
-        fileName = java_file_path.replace(".java", "") + "CounterExample"
-
+def analyse_jbmc_output(jbmc_output, fileName, should_print, properties=None):
     benchmark_object = { 'hasError': None, 'message': "No errors found" }
 
     if jbmc_output:
         print_statements(should_print, "Received JBMC output")
 
-        null_pointer_details = extract_null_pointer_error_details(jbmc_output)
-        divide_by_zero_details = extract_divide_by_zero_error_details(jbmc_output)
-        array_bounds_details = extract_array_index_out_of_bounds_details(jbmc_output)
-        dynamic_cast_details = extract_dynamic_cast_check(jbmc_output)
+        # Detectors for property classes the pre-screen ruled out cannot match
+        not_checked = { 'hasError': False, 'message': "Not checked" }
+        null_pointer_details = extract_null_pointer_error_details(jbmc_output) if should_check('null-pointer', properties) else not_checked
+        divide_by_zero_details = extract_divide_by_zero_error_details(jbmc_output) if should_check('divide-by-zero', properties) else not_checked
+        array_bounds_details = extract_array_index_out_of_bounds_details(jbmc_output) if should_check('array-bounds', properties) else not_checked
+        dynamic_cast_details = extract_dynamic_cast_check(jbmc_output) if should_check('dynamic-cast', properties) else not_checked
 
         error_detected = False
+        # fileName may include a directory, the class declared in the counterexample must not
+        class_name = os.path.basename(fileName)
 
         if "VERIFICATION SUCCESSFUL" in jbmc_output:
             print("No errors found, verification successful.")
@@ -199,7 +323,7 @@ def main(java_file_path, benchmarking, should_print):
         else:
             if null_pointer_details['hasError']:
                 print_statements(should_print, "Null Pointer Exception detected!")
-                java_code_null_pointer = generate_null_pointer_exception_code(null_pointer_details, fileName)
+                java_code_null_pointer = generate_null_pointer_exception_code(null_pointer_details, class_name)
                 fileName = fileName + ".java"
                 write_code_to_file(java_code_null_pointer, fileName)
                 null_pointer_details['file_name'] = fileName
@@ -207,7 +331,7 @@ def main(java_file_path, benchmarking, should_print):
                 error_detected = True
             elif divide_by_zero_details['hasError']:
                 print_statements(should_print, "Divide by Zero Exception detected!")
-                java_code_divide_by_zero = generate_divide_by_zero_exception_code(divide_by_zero_details, fileName)
+                java_code_divide_by_zero = generate_divide_by_zero_exception_code(divide_by_zero_details, class_name)
                 fileName = fileName + ".java"
                 write_code_to_file(java_code_divide_by_zero, fileName)
                 divide_by_zero_details['file_name'] = fileName
@@ -215,7 +339,7 @@ def main(java_file_path, benchmarking, should_print):
                 error_detected = True
             elif array_bounds_details['hasError']:
                 print_statements(should_print, "Array Index Out of Bounds Exception detected!")
-                java_code_array_bounds = generate_array_index_out_of_bounds_exception_code(array_bounds_details, fileName)
+                java_code_array_bounds = generate_array_index_out_of_bounds_exception_code(array_bounds_details, class_name)
                 fileName = fileName + ".java"
                 write_code_to_file(java_code_array_bounds, fileName)  
                 array_bounds_details['file_name'] = fileName
@@ -223,7 +347,7 @@ def main(java_file_path, benchmarking, should_print):
                 error_detected = True 
             elif dynamic_cast_details['hasError']:
                 print_statements(should_print, "Dynamic Cast Exception detected!")
-                java_code_dynamic_cast = generate_dynamic_cast_exception_code(dynamic_cast_details, fileName)
+                java_code_dynamic_cast = generate_dynamic_cast_exception_code(dynamic_cast_details, class_name)
                 fileName = fileName + ".java"
                 write_code_to_file(java_code_dynamic_cast, fileName)
                 dynamic_cast_details['file_name'] = fileName
@@ -236,16 +360,273 @@ def main(java_file_path, benchmarking, should_print):
                 benchmark_object["message"] = "Unknown error detected"
                 benchmark_object["unknown"] = True
 
+    return benchmark_object
+
+
+def run_jar_entry_point(jar_file_path, main_class, should_print, timeout=5, portfolio=None):
+    if portfolio:
+        target_args = ["-jar", jar_file_path, "--main-class", main_class]
+        return run_jbmc_portfolio(target_args, should_print, timeout, portfolio)
+    profile = {}
+    jbmc_output = run_jbmc_on_jar(jar_file_path, should_print, timeout, main_class, profile)
+    return jbmc_output, None, profile
+
+
+def verification_settings(portfolio, use_prescreen):
+    # Everything besides the bytecode a recorded verdict depends on
+    configurations = portfolio or [("default", ["--unwind", "100"], True)]
+    return json.dumps({ 'jbmc': get_jbmc_version(), 'configurations': configurations, 'prescreen': use_prescreen })
+
+
+def mark_no_verdict(benchmark_object, timed_out):
+    # Without a verdict the runner must not read the result as a pass
+    if benchmark_object['hasError'] is None:
+        benchmark_object['noVerdict'] = 'Timeout' if timed_out else 'Unknown'
+    return benchmark_object
+
+
+def verify_jar_incrementally(jar_file_path, state_file_path, should_print, timeout=5, portfolio=None, properties=None,
+                             use_prescreen=True):
+    # Only entry points whose bytecode or callees changed since the recorded run, or that were
+    # verified with another JBMC or other options, are verified again
+    state = load_state(state_file_path)
+    settings = verification_settings(portfolio, use_prescreen)
+    try:
+        fingerprints, changed, verdicts = plan_verification(jar_file_path, state, settings)
+    except (OSError, zipfile.BadZipFile, ClassFormatError) as e:
+        print(f"Could not fingerprint {jar_file_path}: {e}")
+        return None
+    print_statements(should_print, f"{len(changed)} entry points changed, reusing {len(verdicts)} verdicts")
+
+    timed_out = False
+    for main_class in changed:
+        jbmc_output, configuration, profile = run_jar_entry_point(jar_file_path, main_class, should_print, timeout, portfolio)
+        timed_out = timed_out or bool(profile and profile.get('timed_out'))
+        fileName = jar_file_path.replace(".jar", "") + ("" if main_class == "Main" else main_class.replace(".", "_")) + COUNTEREXAMPLE_SUFFIX
+        verdict = analyse_jbmc_output(jbmc_output, fileName, should_print, properties)
+        if configuration:
+            verdict['configuration'] = configuration
+        if profile:
+            verdict['profile'] = profile
+        # Inconclusive runs (timeouts, JBMC errors) are not worth keeping
+        if verdict['hasError'] is not None:
+            verdicts[main_class] = verdict
+
+    record_verdicts(state, jar_file_path, fingerprints, verdicts, settings)
+    save_state(state_file_path, state)
+
+    failing = [verdict for verdict in verdicts.values() if verdict['hasError']]
+    if failing:
+        benchmark_object = dict(failing[0])
+    elif len(verdicts) == len(fingerprints) and verdicts:
+        benchmark_object = { 'hasError': False, 'message': "No errors found, verification successful." }
+    else:
+        benchmark_object = { 'hasError': None, 'message': "No errors found" }
+    benchmark_object['reverified'] = changed
+    return mark_no_verdict(benchmark_object, timed_out)
+
+
+def analyse_target(java_file_path, benchmarking, should_print, timeout=5, portfolio=None, use_prescreen=True,
+                   incremental_state=None, compile_source=True):
+    jbmc_output = None
+    configuration = None
+    profile = None
+    properties = None
+    fileName = "UnknownException"
+
+    if(benchmarking):
+        if use_prescreen:
+            properties = prescreen(java_file_path, benchmarking, should_print)
+        if properties != [] and incremental_state:
+            benchmark_object = verify_jar_incrementally(java_file_path, incremental_state, should_print, timeout, portfolio,
+                                                        properties, use_prescreen)
+            if benchmark_object is not None:
+                return benchmark_object
+        if properties == []:
+            jbmc_output = PRESCREEN_OUTPUT
+        else:
+            jbmc_output, configuration, profile = run_jar_entry_point(java_file_path, "Main", should_print, timeout, portfolio)
+        fileName = java_file_path.replace(".jar", "") + COUNTEREXAMPLE_SUFFIX
+    else:
+        if compile_source:
+            convert_java_to_class(java_file_path, should_print)
+        if use_prescreen:
+            properties = prescreen(java_file_path, benchmarking, should_print)
+        if properties == []:
+            jbmc_output = PRESCREEN_OUTPUT
+        elif portfolio:
+            target_args = [java_file_path.replace(".java", "")]
+            jbmc_output, configuration, profile = run_jbmc_portfolio(target_args, should_print, timeout, portfolio)
+        else:
+            profile = {}
+            jbmc_output = run_jbmc(java_file_path, should_print, timeout, compile_source=False, profile=profile)
+        fileName = java_file_path.replace(".java", "") + COUNTEREXAMPLE_SUFFIX
+
+    benchmark_object = analyse_jbmc_output(jbmc_output, fileName, should_print, properties)
+
+    if configuration:
+        benchmark_object['configuration'] = configuration
+    if profile:
+        benchmark_object['profile'] = profile
+        print_statements(should_print, f"Resource usage: {profile}")
+
+    return mark_no_verdict(benchmark_object, bool(profile and profile.get('timed_out')))
+
+
+def iter_targets(root, patterns):
+    # Walks the tree lazily and in a stable order, skipping hidden directories and the
+    # counterexamples earlier scans wrote next to their targets
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+        for name in sorted(files):
+            if name.endswith(COUNTEREXAMPLE_SUFFIX + ".java"):
+                continue
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                yield os.path.join(directory, name)
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_unique_targets(file_paths, duplicates):
+    # Yields each distinct file once; copies are recorded in duplicates under the first path seen
+    seen = {}
+    for file_path in file_paths:
+        digest = file_digest(file_path)
+        if digest in seen:
+            duplicates.setdefault(seen[digest], []).append(file_path)
+        else:
+            seen[digest] = file_path
+            yield file_path
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def compile_batch(java_file_paths, should_print):
+    # One javac JVM per directory of the batch. Directories are kept apart because layouts like
+    # SV-COMP's put a Main.java in every task, which javac rejects as duplicate classes when
+    # compiled together. If anything fails to compile, that directory's files are compiled
+    # one by one so a broken file does not keep the others from being checked.
+    by_directory = {}
+    for java_file_path in java_file_paths:
+        by_directory.setdefault(os.path.dirname(java_file_path), []).append(java_file_path)
+    for directory_file_paths in by_directory.values():
+        print_statements(should_print, f"Compiling {len(directory_file_paths)} files...")
+        result = subprocess.run(["javac"] + directory_file_paths, capture_output=True, text=True)
+        if result.returncode != 0 and len(directory_file_paths) > 1:
+            for java_file_path in directory_file_paths:
+                convert_java_to_class(java_file_path, should_print)
+
+
+def verdict_label(benchmark_object):
+    if benchmark_object['hasError'] is None:
+        return "No verdict (timeout or JBMC error)"
+    if benchmark_object['hasError']:
+        return benchmark_object.get('message') or benchmark_object.get('error') or "Error detected"
+    return "Verification successful"
+
+
+def scan_directory(root, patterns, should_print, timeout=5, portfolio=None, use_prescreen=True, workers=1,
+                   batch_size=20, report_path=None):
+    duplicates = {}
+    verdicts = {}
+    pending = {}
+    started = time.time()
+
+    def collect(future):
+        file_path = pending.pop(future)
+        try:
+            benchmark_object = future.result()
+        except Exception as e:
+            benchmark_object = { 'hasError': None, 'message': f"Analysis failed: {e}" }
+        verdicts[file_path] = benchmark_object
+        print(f"{file_path}: {verdict_label(benchmark_object)}", flush=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        targets = iter_unique_targets(iter_targets(root, patterns), duplicates)
+        for batch in iter_batches(targets, batch_size):
+            java_file_paths = [file_path for file_path in batch if file_path.endswith(".java")]
+            if java_file_paths:
+                compile_batch(java_file_paths, should_print)
+            for file_path in batch:
+                future = executor.submit(analyse_target, file_path, file_path.endswith(".jar"), should_print, timeout,
+                                         portfolio, use_prescreen, None, False)
+                pending[future] = file_path
+            # Keep the walk only a little ahead of verification and report what has finished
+            while len(pending) > 2 * workers:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            for future in [future for future in pending if future.done()]:
+                collect(future)
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future)
+
+    for original, copies in duplicates.items():
+        for copy in copies:
+            verdicts[copy] = dict(verdicts[original], duplicate_of=original)
+
+    counts = {}
+    for benchmark_object in verdicts.values():
+        label = verdict_label(benchmark_object)
+        counts[label] = counts.get(label, 0) + 1
+
+    elapsed = time.time() - started
+    duplicate_count = sum(len(copies) for copies in duplicates.values())
+    print(f"\nScanned {len(verdicts)} files under {root} ({duplicate_count} duplicates) in {elapsed:.2f}s")
+    for label, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {label}: {count}")
+    failing = sorted(file_path for file_path, benchmark_object in verdicts.items() if benchmark_object['hasError'])
+    if failing:
+        print("Files with errors:")
+        for file_path in failing:
+            counterexample = verdicts[file_path].get('file_name')
+            print(f"  {file_path}" + (f" -> {counterexample}" if counterexample else ""))
+
+    report = { 'root': root, 'elapsed': elapsed, 'counts': counts, 'verdicts': verdicts }
+    if report_path:
+        with open(report_path, 'w') as file:
+            json.dump(report, file, indent=4, default=str)
+        print(f"Report saved to {report_path}")
+    return report
+
+
+def main(java_file_path, benchmarking, should_print, timeout=5, portfolio=None, use_prescreen=True, incremental_state=None):
+    benchmark_object = analyse_target(java_file_path, benchmarking, should_print, timeout, portfolio, use_prescreen, incremental_state)
+
     if(benchmarking):
         print(benchmark_object)
         return benchmark_object
-    
+
 
 if __name__ == "__main__":
     options = parse_args()
     print("Reading file...")
-    if(options.file):
+    if(options.directory):
+        portfolio = select_portfolio(options.portfolio_configs) if options.portfolio else None
+        patterns = [pattern.strip() for pattern in options.glob.split(",") if pattern.strip()]
+        scan_directory(options.directory, patterns, options.print_output, options.timeout, portfolio, options.prescreen,
+                       options.workers, options.batch_size, options.report)
+    elif(options.file):
         print_statements(options.print_output, "Analyzing file...")
-        main(options.file, options.benchmark, options.print_output)
+        portfolio = select_portfolio(options.portfolio_configs) if options.portfolio else None
+        main(options.file, options.benchmark, options.print_output, options.timeout, portfolio, options.prescreen,
+             options.incremental_state)
     else:
         print("No file provided. Exiting...")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+
+# Statistics lines JBMC prints before the results; seconds are summed when a line repeats
+STATISTICS_PATTERNS = {
+    'program_steps': r'size of program expression: (\d+) steps',
+    'vccs': r'Generated (\d+) VCC\(s\)',
+    'vccs_remaining': r'Generated \d+ VCC\(s\), (\d+) remaining after simplification',
+    'variables': r'(\d+) variables, \d+ clauses',
+    'clauses': r'\d+ variables, (\d+) clauses',
+    'symex_seconds': r'Runtime Symex: ([\d.]+)s',
+    'convert_ssa_seconds': r'Runtime Convert SSA: ([\d.]+)s',
+    # JBMC reports the decision procedure's time on a line of its own next to the solver's
+    'solver_seconds': r'Runtime Solver: ([\d.]+)s',
+    'decision_procedure_seconds': r'Runtime decision procedure: ([\d.]+)s',
+}
+
+
+def parse_jbmc_statistics(jbmc_output):
+    # The statistics come before the results, so the (possibly huge) trace is not searched
+    results_start = jbmc_output.find('** Results:')
+    head = jbmc_output if results_start == -1 else jbmc_output[:results_start]
+    statistics = {}
+    for name, pattern in STATISTICS_PATTERNS.items():
+        values = re.findall(pattern, head)
+        if not values:
+            continue
+        if name.endswith('_seconds'):
+            statistics[name] = round(sum(float(value) for value in values), 6)
+        else:
+            statistics[name] = int(values[-1])
+    return statistics
+
+
+def start_profiled(command):
+    # In its own session, so a kill also reaches anything the process started (a wrapper script's
+    # child would otherwise keep running and hold the output pipe open)
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                            start_new_session=True)
+
+
+def kill_profiled(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def wait_profiled(process, timeout=None):
+    # Like communicate(), but reaps the process with wait4 to get its resource usage.
+    # Returns (stdout, profile) or raises TimeoutExpired after killing the process; the
+    # exception's profile attribute holds the usage up to the kill.
+    output = []
+    reader = threading.Thread(target=lambda: output.append(process.stdout.read()), daemon=True)
+    reader.start()
+    started = time.time()
+    deadline = started + timeout if timeout else None
+    delay = 0.001
+    timed_out = False
+    rusage = None
+
+    try:
+        while True:
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if deadline is not None and time.time() >= deadline:
+                timed_out = True
+                kill_profiled(process)
+                _, status, rusage = os.wait4(process.pid, 0)
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    except ChildProcessError:
+        # Somebody else reaped it first (a killed portfolio loser), so there is no usage to report
+        rusage = None
+
+    reader.join()
+    stdout = output[0] if output else ''
+
+    profile = { 'wall_seconds': round(time.time() - started, 6) }
+    if rusage is not None:
+        profile['max_rss_kb'] = rusage.ru_maxrss
+        profile['user_cpu_seconds'] = round(rusage.ru_utime, 6)
+        profile['sys_cpu_seconds'] = round(rusage.ru_stime, 6)
+    profile.update(parse_jbmc_statistics(stdout))
+    if timed_out:
+        # The jobs that time out are the heaviest ones, so their usage is worth keeping
+        profile['timed_out'] = True
+        error = subprocess.TimeoutExpired(process.args, timeout, output=stdout)
+        error.profile = profile
+        raise error
+    return stdout, profile
+
+
+def run_profiled(command, timeout=None):
+    return wait_profiled(start_profiled(command), timeout)
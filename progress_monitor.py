@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+import json
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+COLUMNS = ['File Name', 'Expected Result', 'Actual Result', 'Counter Example Generated?', 'Time to Execute (s)']
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    {refresh}
+    <title>Test Results</title>
+    <style>
+        table {{
+            width: 100%;
+            border-collapse: collapse;
+        }}
+        th, td {{
+            border: 1px solid black;
+            padding: 8px;
+            text-align: left;
+        }}
+        th {{
+            background-color: #f2f2f2;
+        }}
+    </style>
+</head>
+<body>
+    <h1>Test Execution Results</h1>
+    <p id="progress">{progress}</p>
+    <table id="resultsTable">
+        <tr>
+{headers}
+        </tr>
+    </table>
+
+    <script>
+        var columns = {columns};
+        var data = {data};
+
+        var table = document.getElementById('resultsTable');
+
+        data.forEach(function(test) {{
+            var row = table.insertRow(-1);
+            columns.forEach(function(column, index) {{
+                row.insertCell(index).textContent = test[column] === undefined ? "" : test[column];
+            }});
+        }});
+    </script>
+</body>
+</html>
+"""
+
+
+def read_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def child_pids(parent_pid):
+    # Every live descendant of parent_pid, read from /proc (empty where /proc is not available)
+    parents = {}
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as file:
+                    # The command name may contain spaces, the parent pid follows its closing parenthesis
+                    fields = file.read().rsplit(')', 1)[1].split()
+                parents.setdefault(int(fields[1]), []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        return []
+
+    descendants = []
+    pending = [parent_pid]
+    while pending:
+        for child in parents.get(pending.pop(), []):
+            descendants.append(child)
+            pending.append(child)
+    return descendants
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.total += value
+
+
+class ProgressMonitor:
+    # Collects job events from the runner's worker threads, serves them as
+    # Prometheus metrics and keeps an HTML results table up to date
+
+    def __init__(self, html_path=None, buckets=LATENCY_BUCKETS):
+        self.html_path = html_path
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.queued = 0
+        self.running = 0
+        self.done = {}
+        self.timeouts = 0
+        self.latency = {}
+        self.rows = []
+        self.finished = False
+
+    def job_queued(self, task):
+        with self.lock:
+            self.queued += 1
+
+    def job_started(self, task):
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+    def job_finished(self, row, phases=None, started=True):
+        with self.lock:
+            if started:
+                self.running -= 1
+            else:
+                self.queued -= 1
+            result = row.get('Actual Result', 'Unknown')
+            self.done[result] = self.done.get(result, 0) + 1
+            if result == 'Timeout':
+                self.timeouts += 1
+            for phase, seconds in (phases or {}).items():
+                self.latency.setdefault(phase, Histogram(self.buckets)).observe(seconds)
+            self.rows.append(row)
+            self._write_html_locked()
+
+    def run_finished(self):
+        with self.lock:
+            self.finished = True
+            self._write_html_locked()
+
+    def render_metrics(self):
+        worker_rss = sum(read_rss_kb(pid) for pid in child_pids(os.getpid()))
+        peak_child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        with self.lock:
+            lines = [
+                "# HELP jbmc_jobs_queued Jobs waiting for a worker",
+                "# TYPE jbmc_jobs_queued gauge",
+                f"jbmc_jobs_queued {self.queued}",
+                "# HELP jbmc_jobs_running Jobs currently being verified",
+                "# TYPE jbmc_jobs_running gauge",
+                f"jbmc_jobs_running {self.running}",
+                "# HELP jbmc_jobs_done_total Finished jobs by result",
+                "# TYPE jbmc_jobs_done_total counter",
+            ]
+            for result, count in sorted(self.done.items()):
+                lines.append(f'jbmc_jobs_done_total{{result="{result}"}} {count}')
+            lines += [
+                "# HELP jbmc_timeouts_total Jobs that hit their timeout",
+                "# TYPE jbmc_timeouts_total counter",
+                f"jbmc_timeouts_total {self.timeouts}",
+                "# HELP jbmc_phase_seconds Latency of each phase of a job",
+                "# TYPE jbmc_phase_seconds histogram",
+            ]
+            for phase, histogram in sorted(self.latency.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'jbmc_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {count}')
+                lines.append(f'jbmc_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}')
+                lines.append(f'jbmc_phase_seconds_sum{{phase="{phase}"}} {histogram.total:.6f}')
+                lines.append(f'jbmc_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+            lines += [
+                "# HELP jbmc_worker_rss_bytes Resident memory of all running worker processes",
+                "# TYPE jbmc_worker_rss_bytes gauge",
+                f"jbmc_worker_rss_bytes {worker_rss * 1024}",
+                "# HELP jbmc_worker_peak_rss_bytes Largest resident memory of any finished worker process",
+                "# TYPE jbmc_worker_peak_rss_bytes gauge",
+                f"jbmc_worker_peak_rss_bytes {peak_child_rss * 1024}",
+                "# HELP jbmc_run_elapsed_seconds Time since the run started",
+                "# TYPE jbmc_run_elapsed_seconds gauge",
+                f"jbmc_run_elapsed_seconds {time.time() - self.started_at:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def render_html(self):
+        with self.lock:
+            return self._render_html_locked()
+
+    def _render_html_locked(self):
+        done = sum(self.done.values())
+        elapsed = time.time() - self.started_at
+        state = "Finished" if self.finished else "Running"
+        progress = f"{state}: {done} done, {self.running} running, {self.queued} queued, {self.timeouts} timeouts, {elapsed:.0f}s elapsed"
+        columns = list(COLUMNS)
+        for row in self.rows:
+            columns += [column for column in row if column not in columns]
+        headers = "\n".join(f"            <th>{column}</th>" for column in columns)
+        # Escaping "</" keeps a file name from closing the script element
+        data = json.dumps(self.rows, indent=4).replace("</", "<\\/")
+        return HTML_TEMPLATE.format(
+            refresh='' if self.finished else '<meta http-equiv="refresh" content="5">',
+            progress=progress,
+            headers=headers,
+            columns=json.dumps(columns),
+            data=data)
+
+    def _write_html_locked(self):
+        if not self.html_path:
+            return
+        # Replace the file in one step so a browser never sees half a table
+        temporary_path = self.html_path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            file.write(self._render_html_locked())
+        os.replace(temporary_path, self.html_path)
+
+
+def start_metrics_server(monitor, port, host='127.0.0.1'):
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = monitor.render_metrics().encode()
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path in ('/', '/results'):
+                body = monitor.render_html().encode()
+                content_type = 'text/html; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+import os
+import sqlite3
+import subprocess
+import optparse
+import threading
+import time
+from tabulate import tabulate
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    suite TEXT,
+    jbmc_version TEXT,
+    options TEXT,
+    git_commit TEXT
+);
+CREATE TABLE IF NOT EXISTS task_results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT NOT NULL,
+    expected TEXT,
+    actual TEXT,
+    counter_example INTEGER,
+    elapsed REAL,
+    configuration TEXT,
+    PRIMARY KEY (run_id, task)
+);
+CREATE TABLE IF NOT EXISTS phase_timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    seconds REAL,
+    PRIMARY KEY (run_id, task, phase)
+);
+CREATE TABLE IF NOT EXISTS task_resources (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT NOT NULL,
+    max_rss_kb INTEGER,
+    user_cpu_seconds REAL,
+    sys_cpu_seconds REAL,
+    symex_seconds REAL,
+    solver_seconds REAL,
+    program_steps INTEGER,
+    vccs INTEGER,
+    vccs_remaining INTEGER,
+    wall_seconds REAL,
+    convert_ssa_seconds REAL,
+    decision_procedure_seconds REAL,
+    variables INTEGER,
+    clauses INTEGER,
+    PRIMARY KEY (run_id, task)
+);
+CREATE INDEX IF NOT EXISTS idx_task_results_task ON task_results(task, run_id);
+CREATE INDEX IF NOT EXISTS idx_phase_timings_task ON phase_timings(task, phase, run_id);
+CREATE INDEX IF NOT EXISTS idx_task_resources_task ON task_resources(task, run_id);
+"""
+
+RESOURCE_COLUMNS = ['max_rss_kb', 'user_cpu_seconds', 'sys_cpu_seconds', 'symex_seconds', 'solver_seconds',
+                    'program_steps', 'vccs', 'vccs_remaining', 'wall_seconds', 'convert_ssa_seconds',
+                    'decision_procedure_seconds', 'variables', 'clauses']
+
+
+def connect_results_db(db_path):
+    # The runner may record results from worker threads, serialised by ResultsWriter
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    ensure_columns(conn, 'task_results', {'configuration': 'TEXT'})
+    ensure_columns(conn, 'task_resources', {
+        'wall_seconds': 'REAL',
+        'convert_ssa_seconds': 'REAL',
+        'decision_procedure_seconds': 'REAL',
+        'variables': 'INTEGER',
+        'clauses': 'INTEGER',
+    })
+    return conn
+
+
+def ensure_columns(conn, table, columns):
+    # Databases written by older versions lack columns added since
+    existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+    with conn:
+        for column, column_type in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def read_command_output(command, cwd=None):
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=10, cwd=cwd)
+        output = result.stdout.strip()
+        return output.splitlines()[0] if output else None
+    except Exception:
+        return None
+
+
+def get_jbmc_version():
+    return read_command_output(["jbmc", "--version"])
+
+
+def get_git_commit():
+    # Commit of the verifier itself, not of whatever directory the runner is in
+    return read_command_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_run(conn, suite, options):
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (started_at, suite, jbmc_version, options, git_commit) VALUES (?, ?, ?, ?, ?)",
+            (time.time(), suite, get_jbmc_version(), options, get_git_commit()))
+    return cursor.lastrowid
+
+
+class ResultsWriter:
+    # Buffers task rows and writes them in one transaction per batch
+
+    def __init__(self, conn, run_id, batch_size=50):
+        self.conn = conn
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.results = []
+        self.phases = []
+        self.resources = []
+
+    def add(self, row, phases=None, resources=None):
+        elapsed = row.get('Time to Execute (s)')
+        with self.lock:
+            self.results.append((
+                self.run_id,
+                row['File Name'],
+                row.get('Expected Result'),
+                row.get('Actual Result'),
+                1 if row.get('Counter Example Generated?') == 'Yes' else 0,
+                float(elapsed) if elapsed is not None else None,
+                row.get('Configuration')))
+            for phase, seconds in (phases or {}).items():
+                self.phases.append((self.run_id, row['File Name'], phase, seconds))
+            if resources:
+                self.resources.append((self.run_id, row['File Name']) + tuple(resources.get(column) for column in RESOURCE_COLUMNS))
+            if len(self.results) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.results and not self.phases and not self.resources:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO task_results (run_id, task, expected, actual, counter_example, elapsed, configuration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", self.results)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO phase_timings (run_id, task, phase, seconds) VALUES (?, ?, ?, ?)",
+                self.phases)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO task_resources (run_id, task, {', '.join(RESOURCE_COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in RESOURCE_COLUMNS)})", self.resources)
+        self.results = []
+        self.phases = []
+        self.resources = []
+
+
+def list_runs(conn, limit=20):
+    return conn.execute(
+        "SELECT r.id, datetime(r.started_at, 'unixepoch', 'localtime') AS started_at, r.suite, r.jbmc_version, r.git_commit, "
+        "r.options, COUNT(t.task) AS tasks "
+        "FROM runs r LEFT JOIN task_results t ON t.run_id = r.id "
+        "GROUP BY r.id ORDER BY r.id DESC LIMIT ?", (limit,)).fetchall()
+
+
+def latest_run_ids(conn, count=2):
+    rows = conn.execute("SELECT id FROM runs ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+    return [row['id'] for row in reversed(rows)]
+
+
+def find_verdict_changes(conn, base_run, head_run):
+    return conn.execute(
+        "SELECT h.task, b.actual AS base_actual, h.actual AS head_actual, h.expected "
+        "FROM task_results h JOIN task_results b ON b.task = h.task AND b.run_id = ? "
+        "WHERE h.run_id = ? AND b.actual IS NOT h.actual ORDER BY h.task",
+        (base_run, head_run)).fetchall()
+
+
+def find_task_set_changes(conn, base_run, head_run):
+    # Tasks only one of the two runs has, which the verdict and runtime comparisons cannot show
+    return conn.execute(
+        "SELECT task, 'added' AS change, actual FROM task_results h WHERE run_id = ? "
+        "AND NOT EXISTS (SELECT 1 FROM task_results b WHERE b.run_id = ? AND b.task = h.task) "
+        "UNION ALL "
+        "SELECT task, 'removed' AS change, actual FROM task_results b WHERE run_id = ? "
+        "AND NOT EXISTS (SELECT 1 FROM task_results h WHERE h.run_id = ? AND h.task = b.task) "
+        "ORDER BY change, task",
+        (head_run, base_run, base_run, head_run)).fetchall()
+
+
+def run_options(conn, run_id):
+    row = conn.execute("SELECT options FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return row['options'] if row else None
+
+
+def find_runtime_regressions(conn, base_run, head_run, min_ratio=1.5, min_delta=0.5):
+    # A task only counts as slower when it is both relatively and absolutely slower,
+    # so sub-second jitter on tiny tasks does not show up as a regression
+    return conn.execute(
+        "SELECT h.task, b.elapsed AS base_elapsed, h.elapsed AS head_elapsed, "
+        "h.elapsed - b.elapsed AS delta "
+        "FROM task_results h JOIN task_results b ON b.task = h.task AND b.run_id = ? "
+        "WHERE h.run_id = ? AND h.elapsed - b.elapsed >= ? AND h.elapsed >= b.elapsed * ? "
+        "ORDER BY delta DESC",
+        (base_run, head_run, min_delta, min_ratio)).fetchall()
+
+
+def task_history(conn, task, limit=10):
+    return conn.execute(
+        "SELECT run_id, actual, elapsed FROM task_results WHERE task = ? ORDER BY run_id DESC LIMIT ?",
+        (task, limit)).fetchall()
+
+
+def portfolio_wins(conn, run_ids=None):
+    # How often each portfolio configuration delivered the verdict, over the given runs or all of them
+    query = ("SELECT configuration, COUNT(*) AS wins, AVG(elapsed) AS mean_elapsed, "
+             "SUM(actual = 'False') AS failures_found "
+             "FROM task_results WHERE configuration IS NOT NULL")
+    params = ()
+    if run_ids:
+        query += f" AND run_id IN ({', '.join('?' for _ in run_ids)})"
+        params = tuple(run_ids)
+    query += " GROUP BY configuration ORDER BY wins DESC"
+    return conn.execute(query, params).fetchall()
+
+
+def most_expensive_tasks(conn, run_id, limit=10, order_by='max_rss_kb'):
+    if order_by not in RESOURCE_COLUMNS:
+        raise ValueError(f"Cannot order by {order_by}")
+    return conn.execute(
+        f"SELECT r.task, t.actual, t.elapsed, {', '.join('r.' + column for column in RESOURCE_COLUMNS)} "
+        "FROM task_resources r JOIN task_results t ON t.run_id = r.run_id AND t.task = r.task "
+        f"WHERE r.run_id = ? ORDER BY r.{order_by} DESC LIMIT ?", (run_id, limit)).fetchall()
+
+
+def print_regression_report(conn, base_run, head_run, min_ratio, min_delta):
+    verdict_changes = find_verdict_changes(conn, base_run, head_run)
+    runtime_regressions = find_runtime_regressions(conn, base_run, head_run, min_ratio, min_delta)
+    task_set_changes = find_task_set_changes(conn, base_run, head_run)
+
+    print(f"Comparing run {base_run} (base) with run {head_run} (head)")
+    base_options = run_options(conn, base_run)
+    head_options = run_options(conn, head_run)
+    if base_options != head_options:
+        print("The runs used different options, so changes may come from the configuration:")
+        print(f"  base: {base_options}")
+        print(f"  head: {head_options}")
+
+    print(f"\nTasks added or removed: {len(task_set_changes)}")
+    if task_set_changes:
+        print(tabulate([dict(row) for row in task_set_changes], headers="keys", tablefmt="grid"))
+    print(f"\nVerdict changes: {len(verdict_changes)}")
+    if verdict_changes:
+        print(tabulate([dict(row) for row in verdict_changes], headers="keys", tablefmt="grid"))
+
+    print(f"\nRuntime regressions (>= {min_ratio:.2f}x and >= {min_delta:.2f}s slower): {len(runtime_regressions)}")
+    if runtime_regressions:
+        print(tabulate([dict(row) for row in runtime_regressions], headers="keys", tablefmt="grid", floatfmt=".2f"))
+
+
+def parse_args():
+    parser = optparse.OptionParser()
+    parser.add_option("-d", "--db", dest="db", default="results.db", help="Path to the SQLite results database")
+    parser.add_option("-l", "--list", dest="list_runs", action="store_true", help="List the recorded runs")
+    parser.add_option("--portfolio-wins", dest="portfolio_wins", action="store_true", help="Show which portfolio configurations won")
+    parser.add_option("--top", dest="top", type="int", help="Show the N most expensive tasks of the head run")
+    parser.add_option("--by", dest="order_by", default="max_rss_kb", help=f"Resource to rank --top by: {', '.join(RESOURCE_COLUMNS)}")
+    parser.add_option("--base", dest="base", type="int", help="Run id to compare against (default: second latest)")
+    parser.add_option("--head", dest="head", type="int", help="Run id to compare (default: latest)")
+    parser.add_option("--min-ratio", dest="min_ratio", type="float", default=1.5, help="Slowdown ratio counted as a regression")
+    parser.add_option("--min-delta", dest="min_delta", type="float", default=0.5, help="Slowdown in seconds counted as a regression")
+    (options, args) = parser.parse_args()
+    return options
+
+
+if __name__ == "__main__":
+    options = parse_args()
+    conn = connect_results_db(options.db)
+
+    if options.list_runs:
+        print(tabulate([dict(row) for row in list_runs(conn)], headers="keys", tablefmt="grid"))
+    elif options.portfolio_wins:
+        run_ids = [options.head] if options.head is not None else None
+        print(tabulate([dict(row) for row in portfolio_wins(conn, run_ids)], headers="keys", tablefmt="grid", floatfmt=".2f"))
+    elif options.top:
+        latest = latest_run_ids(conn, 1)
+        head_run = options.head if options.head is not None else (latest[-1] if latest else None)
+        if head_run is None:
+            print("No runs recorded. Exiting...")
+        else:
+            rows = most_expensive_tasks(conn, head_run, options.top, options.order_by)
+            print(tabulate([dict(row) for row in rows], headers="keys", tablefmt="grid", floatfmt=".2f"))
+    else:
+        latest = latest_run_ids(conn)
+        head_run = options.head if options.head is not None else (latest[-1] if latest else None)
+        base_run = options.base if options.base is not None else (latest[0] if len(latest) == 2 else None)
+        if base_run is None or head_run is None:
+            print("Need two runs to compare. Exiting...")
+        else:
+            print_regression_report(conn, base_run, head_run, options.min_ratio, options.min_delta)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+import threading
+import time
+from statistics import median
+
+MIN_TIMEOUT_FACTOR = 0.25
+MAX_TIMEOUT_FACTOR = 10
+# A job is only started with at least this much of the budget left; shorter timeouts
+# cannot be passed on to the analyser (it would read -t 0.00 as no timeout at all)
+MIN_JOB_TIMEOUT = 0.05
+
+
+def historical_runtimes(conn, runs=5):
+    # Median runtime per task over its last few recorded runs
+    rows = conn.execute(
+        "SELECT task, actual, elapsed FROM ("
+        "  SELECT task, actual, elapsed, run_id, ROW_NUMBER() OVER (PARTITION BY task ORDER BY run_id DESC) AS age"
+        "  FROM task_results WHERE elapsed IS NOT NULL"
+        ") WHERE age <= ? ORDER BY run_id DESC", (runs,)).fetchall()
+
+    # Newest first, so the first sample of a task is its latest run
+    samples = {}
+    for row in rows:
+        samples.setdefault(row['task'], []).append((row['elapsed'], row['actual'] == 'Timeout'))
+
+    history = {}
+    for task, task_samples in samples.items():
+        history[task] = {
+            'runtime': median(elapsed for elapsed, _ in task_samples),
+            'longest': max(elapsed for elapsed, _ in task_samples),
+            'timed_out': task_samples[0][1],
+        }
+    return history
+
+
+def task_timeout(entry, default_timeout, min_timeout, max_timeout, factor=2.0, margin=0.5):
+    if entry is None:
+        return default_timeout
+    if entry['timed_out']:
+        # The last attempt was cut off, so its runtime is only a lower bound
+        return min(max_timeout, max(entry['longest'] * 2, default_timeout))
+    timeout = max(entry['runtime'], entry['longest']) * factor + margin
+    return min(max_timeout, max(min_timeout, timeout))
+
+
+def timeout_bounds(default_timeout, min_timeout=None, max_timeout=None, budget=None):
+    # Without explicit bounds, tasks with history may get a quarter to ten times the default timeout
+    min_timeout = default_timeout * MIN_TIMEOUT_FACTOR if min_timeout is None else min_timeout
+    max_timeout = default_timeout * MAX_TIMEOUT_FACTOR if max_timeout is None else max(max_timeout, default_timeout)
+    if budget:
+        # No single task may need more than the whole run is allowed
+        max_timeout = min(max_timeout, budget)
+        min_timeout = min(min_timeout, max_timeout)
+    return min_timeout, max_timeout
+
+
+def plan_jobs(tasks, history, default_timeout, min_timeout=None, max_timeout=None, budget=None):
+    min_timeout, max_timeout = timeout_bounds(default_timeout, min_timeout, max_timeout, budget)
+
+    jobs = []
+    for task in tasks:
+        entry = history.get(task)
+        jobs.append({
+            'task': task,
+            # Tasks without history are assumed to use their whole timeout
+            'predicted': entry['runtime'] if entry else default_timeout,
+            'timeout': task_timeout(entry, default_timeout, min_timeout, max_timeout),
+        })
+
+    # Longest processing time first keeps the tail of the run short
+    jobs.sort(key=lambda job: job['predicted'], reverse=True)
+    return jobs
+
+
+def available_memory_kb():
+    # MemAvailable from /proc/meminfo, None where it cannot be read
+    try:
+        with open('/proc/meminfo') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def historical_peak_rss(conn, runs=5):
+    # Largest peak RSS per task over its last few recorded runs
+    rows = conn.execute(
+        "SELECT task, MAX(max_rss_kb) AS max_rss_kb FROM ("
+        "  SELECT task, max_rss_kb, ROW_NUMBER() OVER (PARTITION BY task ORDER BY run_id DESC) AS age"
+        "  FROM task_resources WHERE max_rss_kb IS NOT NULL"
+        ") WHERE age <= ? GROUP BY task", (runs,)).fetchall()
+    return {row['task']: row['max_rss_kb'] for row in rows}
+
+
+def predict_memory(jobs, rss_history, program_sizes, default_rss_kb, margin=1.2, processes=1):
+    # Tasks with history get their recorded peak plus a margin. Tasks without it are scaled
+    # from their program size by the median peak RSS per byte of the tasks that have history.
+    # Recorded peaks and default_rss_kb are per JBMC process, so a task that runs several
+    # processes at once (a portfolio) is predicted to need that many times as much.
+    ratios = [rss_history[task] / program_sizes[task] for task in rss_history if program_sizes.get(task)]
+    rss_per_byte = median(ratios) if ratios else None
+    for job in jobs:
+        task = job['task']
+        if task in rss_history:
+            rss_kb = int(rss_history[task] * margin)
+        elif rss_per_byte and program_sizes.get(task):
+            rss_kb = max(default_rss_kb, int(program_sizes[task] * rss_per_byte * margin))
+        else:
+            rss_kb = default_rss_kb
+        job['rss_kb'] = rss_kb * processes
+    return jobs
+
+
+def run_jobs(jobs, run_one, workers=1, budget=None, memory_limit_kb=None):
+    # run_one(job, timeout) is called from worker threads; jobs that cannot start
+    # before the wall-clock budget runs out are returned as skipped.
+    # With memory_limit_kb, a job only starts when its predicted peak RSS ('rss_kb')
+    # fits next to the jobs already running and in the memory currently free.
+    deadline = time.time() + budget if budget else None
+    pending = list(jobs)
+    results = []
+    skipped = []
+    condition = threading.Condition()
+    running = {'count': 0, 'reserved_kb': 0}
+
+    def fits(job, free_kb):
+        if memory_limit_kb is None or running['count'] == 0:
+            # A job heavier than the whole limit still has to run, just alone
+            return True
+        needed = job.get('rss_kb', 0)
+        return running['reserved_kb'] + needed <= memory_limit_kb and (free_kb is None or needed <= free_kb)
+
+    def next_job():
+        # The first pending job that fits, so light jobs keep the cores busy while a heavy one waits
+        while True:
+            if not pending:
+                return None
+            if deadline is not None and deadline - time.time() < MIN_JOB_TIMEOUT:
+                skipped.extend(pending)
+                pending.clear()
+                return None
+            free_kb = available_memory_kb() if memory_limit_kb is not None else None
+            for index, job in enumerate(pending):
+                if fits(job, free_kb):
+                    return pending.pop(index)
+            # Free memory is re-read periodically, so memory released elsewhere is noticed too
+            condition.wait(0.5)
+
+    def worker():
+        while True:
+            with condition:
+                job = next_job()
+                if job is None:
+                    condition.notify_all()
+                    return
+                running['count'] += 1
+                running['reserved_kb'] += job.get('rss_kb', 0)
+                timeout = job['timeout']
+                if deadline is not None:
+                    timeout = max(MIN_JOB_TIMEOUT, min(timeout, deadline - time.time()))
+
+            result = None
+            try:
+                result = run_one(job, timeout)
+            finally:
+                with condition:
+                    running['count'] -= 1
+                    running['reserved_kb'] -= job.get('rss_kb', 0)
+                    if result is not None:
+                        results.append(result)
+                    condition.notify_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, skipped